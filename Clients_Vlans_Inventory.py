@@ -1,11 +1,22 @@
+import ahocorasick
+import asyncio
+import aiohttp
 import meraki
+import meraki.aio
+import msgpack
 import os
+import random
+import re
+import time
+from collections import deque
 from datetime import datetime
-import json
-import pandas as pd
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
 import dotenv
 from dotenv import load_dotenv
 import openpyxl
+from cache import cached_async
 
 """
 Features
@@ -27,7 +38,7 @@ Only includes ports in access mode (not trunk)
 
 Retrieves all devices across all networks
 Displays: Serial number, model, MAC address, firmware version, LAN IP, status, and last reported time
-Attempts to retrieve uptime information when available
+Uptime is reported as N/A, because the Dashboard API does not expose device uptime
 
 Output
 
@@ -35,21 +46,27 @@ The script provides:
 
 
 Console Output: Real-time progress and results
+Parquet Export: clients.parquet, ports.parquet and devices.parquet, the primary output for analysis
 JSON Export: meraki_audit_results.json containing all collected data
+Excel Export: output.xlsx with Clients, Ports and Devices sheets
+Checkpoint File: checkpoint.msgpack, appended to as each network finishes; an interrupted run of the same
+organization resumes from it if it is under a day old, and it is removed once the exports are written
 Log Files: Created in logs/ directory for troubleshooting
 
 Notes
 
-API Rate Limits: The script includes error handling but may need rate limiting for very large deployments
+API Rate Limits: 429 responses are retried with exponential backoff (honoring Retry-After), and switch port calls that
+still fail with a 429, 5xx or connection error are retried once more after each network's first pass
 Permissions: Ensure your API key has read access to all required resources
-Uptime Data: Uptime may not be available for all device types
 Client History: Client data is limited to the last 30 days by default
 
+Cached Responses: API responses are kept in .meraki_cache/ for 5 minutes. If a call fails, a response
+up to a day old is used instead and the affected rows are marked stale=True
+
 Edge Cases Handled
 
 Missing or unavailable device data
 Networks without switches
-Devices that don't support uplink queries
 Empty client lists
 API timeout or connectivity issues"""
 
@@ -60,89 +77,249 @@ ORG_ID = os.environ.get('ORG_ID')
 TARGET_MANUFACTURERS = ['Dell', 'Adrenaline', 'Nintendo']
 TARGET_MAC_PREFIX = '50a4.d0'
 TARGET_VLAN = 10
-
-
-def initialize_dashboard(api_key):
-    """Initialize Meraki Dashboard API client"""
+CLIENT_TIMESPAN = 2592000  # 30 days in seconds
+PER_PAGE = 1000  # Largest page size the paginated endpoints used here all accept
+MAX_CONCURRENT_NETWORKS = 5  # Stay under Meraki's 10 req/s per-org rate limit
+BACKOFF_MAX_TRIES = 6
+BACKOFF_BASE = 1.0  # Seconds; doubled on every 429 unless Retry-After asks for longer
+BACKOFF_JITTER = 0.5
+CACHE_TTL = 300  # Reuse API responses younger than this (seconds) without calling the API
+CACHE_FALLBACK_TTL = 86400  # If the API call fails, serve a cached response up to a day old and mark it stale
+# Per-network results are appended here as msgpack records, after a header record, and exported once at the end
+CHECKPOINT_FILE = 'checkpoint.msgpack'
+CHECKPOINT_MAX_AGE = CACHE_FALLBACK_TTL  # Older checkpoints are discarded, like cached responses
+
+# Client filter constants, derived once here instead of for every client
+TARGET_MFRS_LOWER = tuple(mfr.lower() for mfr in TARGET_MANUFACTURERS)
+# The automaton finds any target manufacturer in one pass over a string, however many targets there are
+MFR_AUTOMATON = ahocorasick.Automaton()
+for mfr in TARGET_MFRS_LOWER:
+    MFR_AUTOMATON.add_word(mfr, mfr)
+if TARGET_MFRS_LOWER:
+    MFR_AUTOMATON.make_automaton()
+MAC_NORM_RE = re.compile(r'[:\-.]')
+TARGET_MAC_PREFIX_NORM = MAC_NORM_RE.sub('', TARGET_MAC_PREFIX.lower())
+# TARGET_MAC_PREFIX in the aa:bb:cc form the API's partial-match mac filter expects
+TARGET_MAC_QUERY = ':'.join(TARGET_MAC_PREFIX_NORM[i:i + 2] for i in range(0, len(TARGET_MAC_PREFIX_NORM), 2))
+# Fields reported per matching client, with the value used when the API omits one
+CLIENT_DEFAULTS = {
+    'description': 'N/A',
+    'mac': None,
+    'ip': 'N/A',
+    'manufacturer': 'Unknown',
+    'os': 'N/A',
+    'vlan': 'N/A',
+    'status': 'N/A',
+    'lastSeen': 'N/A'
+}
+
+# Column order of each exported sheet, matching the keys of the result dicts
+# Results are kept column-wise, as {column: [value per row]}, instead of one dict per row
+# 'stale' is True when a row was built from a cached response because the live API call failed
+CLIENT_COLUMNS = ['network'] + list(CLIENT_DEFAULTS) + ['stale']
+PORT_COLUMNS = ['network', 'switch_name', 'switch_serial', 'switch_model', 'port_id', 'name', 'vlan', 'type',
+                'enabled', 'poe_enabled', 'link_status', 'stale']
+DEVICE_COLUMNS = ['network', 'name', 'serial', 'model', 'mac', 'firmware', 'lan_ip', 'tags', 'uptime', 'status',
+                  'lastReportedAt', 'stale']
+
+# Fixed Parquet schema for each column list, so a column has the same type on every run
+# getNetworkClients reports vlan and lastSeen as strings, so the client columns keep them as text
+CLIENT_SCHEMA = pa.schema([
+    ('network', pa.string()), ('description', pa.string()), ('mac', pa.string()), ('ip', pa.string()),
+    ('manufacturer', pa.string()), ('os', pa.string()), ('vlan', pa.string()), ('status', pa.string()),
+    ('lastSeen', pa.string()), ('stale', pa.bool_())
+])
+PORT_SCHEMA = pa.schema([
+    ('network', pa.string()), ('switch_name', pa.string()), ('switch_serial', pa.string()),
+    ('switch_model', pa.string()), ('port_id', pa.string()), ('name', pa.string()), ('vlan', pa.int64()),
+    ('type', pa.string()), ('enabled', pa.bool_()), ('poe_enabled', pa.bool_()), ('link_status', pa.string()),
+    ('stale', pa.bool_())
+])
+DEVICE_SCHEMA = pa.schema([
+    ('network', pa.string()), ('name', pa.string()), ('serial', pa.string()), ('model', pa.string()),
+    ('mac', pa.string()), ('firmware', pa.string()), ('lan_ip', pa.string()), ('tags', pa.list_(pa.string())),
+    ('uptime', pa.int64()), ('status', pa.string()), ('lastReportedAt', pa.string()), ('stale', pa.bool_())
+])
+# Display placeholders for missing values, written to Parquet as nulls
+PLACEHOLDERS = frozenset({'N/A', 'Unknown'})
+
+
+async def initialize_dashboard(api_key):
+    """Initialize async Meraki Dashboard API client (must be called inside the event loop)"""
     try:
-        dashboard = meraki.DashboardAPI(
+        dashboard = meraki.aio.AsyncDashboardAPI(
             api_key=api_key,
+            maximum_concurrent_requests=MAX_CONCURRENT_NETWORKS,
+            single_request_timeout=30,
+            wait_on_rate_limit=True,
+            nginx_429_retry_wait_time=10,
+            maximum_retries=10,
             print_console=True,
             # output_log=True,
             # log_file_prefix=os.path.basename(__file__)[:-3],
             # log_path='logs/',
             suppress_logging=True
         )
+
+        # aiohttp already keeps connections alive; this replacement session only raises the idle keep-alive
+        # timeout from aiohttp's default 15 seconds, so calls spaced out by backoff can still reuse a connection
+        default_session = dashboard._session._req_session
+        dashboard._session._req_session = aiohttp.ClientSession(
+            headers=default_session.headers,
+            timeout=default_session.timeout,
+            connector=aiohttp.TCPConnector(keepalive_timeout=60)
+        )
+        await default_session.close()
         return dashboard
     except Exception as e:
         print(f"Error initializing Dashboard API: {e}")
         return None
 
 
-def get_all_organizations(dashboard):
+async def with_backoff(fn, *args, max_tries=BACKOFF_MAX_TRIES, base=BACKOFF_BASE, **kwargs):
+    """Await a Dashboard API call, retrying 429s with Retry-After aware exponential backoff and jitter"""
+    for attempt in range(max_tries):
+        try:
+            return await fn(*args, **kwargs)
+        except meraki.exceptions.AsyncAPIError as e:
+            if e.status != 429 or attempt == max_tries - 1:
+                raise
+            delay = base * 2 ** attempt
+            retry_after = e.response.headers.get('Retry-After') if e.response is not None else None
+            try:
+                delay = max(float(retry_after), delay)
+            except (TypeError, ValueError):
+                pass  # Missing, or an HTTP-date rather than seconds; keep the exponential delay
+            await asyncio.sleep(delay + random.uniform(0, BACKOFF_JITTER))
+
+
+def is_transient(error):
+    """True if a failed API call is worth retrying: rate limited, a server error or no response at all"""
+    return error.status is None or error.status == 429 or error.status >= 500
+
+
+async def cached_call(key, fn, *args, **kwargs):
+    """Await a Dashboard API call with backoff through the on-disk cache; returns (value, stale)"""
+    return await cached_async(key, CACHE_TTL, CACHE_FALLBACK_TTL, with_backoff, fn, *args, **kwargs)
+
+
+async def drain_retry_queue(retry_queue):
+    """Reprocess API calls that failed during the first pass instead of discarding their data"""
+    while retry_queue:
+        description, retry = retry_queue.popleft()
+        try:
+            await retry()
+            print(f"  Retry succeeded for {description}")
+        except Exception as e:
+            print(f"  Retry failed for {description}: {e}")
+
+
+def new_columns(columns):
+    """Return an empty column-wise result set with one list per column"""
+    return {column: [] for column in columns}
+
+
+def extend_columns(target, source):
+    """Append every row of one column-wise result set to another"""
+    for column, values in target.items():
+        values.extend(source[column])
+
+
+def column_rows(columns):
+    """Convert a column-wise result set to a list of row dicts"""
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+async def get_all_organizations(dashboard):
     """Retrieve all organizations"""
     try:
-        organizations = dashboard.organizations.getOrganizations()
+        organizations = await with_backoff(dashboard.organizations.getOrganizations)
         return organizations
     except Exception as e:
         print(f"Error retrieving organizations: {e}")
         return []
 
 
-def get_all_networks(dashboard, org_id):
-    """Retrieve all networks in an organization"""
+async def get_all_networks(dashboard, org_id):
+    """Retrieve all networks in an organization; returns None if they could not be retrieved"""
     try:
-        networks = dashboard.organizations.getOrganizationNetworks(org_id)
+        networks, _ = await cached_call(('getOrganizationNetworks', org_id),
+                                        dashboard.organizations.getOrganizationNetworks, org_id,
+                                        total_pages='all', perPage=PER_PAGE)
         return networks
     except Exception as e:
         print(f"Error retrieving networks for org {org_id}: {e}")
-        return []
+        return None
+
+
+async def get_device_statuses(dashboard, org_id):
+    """Retrieve the status of every device in an organization, keyed by serial, and whether it is stale"""
+    try:
+        statuses, stale = await cached_call(('getOrganizationDevicesStatuses', org_id),
+                                            dashboard.organizations.getOrganizationDevicesStatuses, org_id,
+                                            total_pages='all', perPage=PER_PAGE)
+        return {status['serial']: status for status in statuses}, stale
+    except Exception as e:
+        print(f"Error retrieving device statuses for org {org_id}: {e}")
+        return {}, False
 
 
-def get_filtered_clients(dashboard, network_id, network_name):
+async def get_network_devices(dashboard, network_id, network_name):
+    """Retrieve all devices in a network, and whether the list is stale"""
+    try:
+        return await cached_call(('getNetworkDevices', network_id), dashboard.networks.getNetworkDevices, network_id)
+    except Exception as e:
+        print(f"Error retrieving devices for network {network_name}: {e}")
+        return [], False
+
+
+async def get_filtered_clients(dashboard, network_id, network_name):
     """Get clients matching manufacturer or MAC criteria"""
     print(f"\n{'=' * 80}")
     print(f"Analyzing Clients in Network: {network_name} (ID: {network_id})")
     print(f"{'=' * 80}")
 
-    filtered_clients = []
+    filtered_clients = new_columns(CLIENT_COLUMNS)
 
     try:
-        # Get clients from the last 30 days
-        clients = dashboard.networks.getNetworkClients(
+        # Manufacturer can only be matched here, but a MAC-only search can be filtered by Meraki
+        server_filter = {} if TARGET_MANUFACTURERS else {'mac': TARGET_MAC_QUERY}
+
+        # Get clients from the last 30 days, following every page
+        clients, stale = await cached_call(
+            ('getNetworkClients', network_id),
+            dashboard.networks.getNetworkClients,
             network_id,
-            # timespan=2592000  # 30 days in seconds
+            total_pages='all',
+            perPage=PER_PAGE,
+            timespan=CLIENT_TIMESPAN,
+            **server_filter
         )
 
-        for client in clients:
+        # Clients share a handful of manufacturer strings, so scan each distinct one only once
+        manufacturer_matches = {}
 
-            manufacturer = client.get('manufacturer')
-            if client.get('manufacturer') is not None:
-                manufacturer = manufacturer.lower()
+        for client in clients:
+            manufacturer = (client.get('manufacturer') or '').lower()
+            if manufacturer not in manufacturer_matches:
+                manufacturer_matches[manufacturer] = bool(TARGET_MFRS_LOWER) and \
+                    next(MFR_AUTOMATON.iter(manufacturer), None) is not None
 
-            mac_address = client.get('mac', '').lower()
-            # print(client)
+            mac_address = MAC_NORM_RE.sub('', (client.get('mac') or '').lower())
 
             # Check if manufacturer matches or MAC contains target prefix
-            if (manufacturer is not None and any(mfr.lower() in manufacturer for mfr in TARGET_MANUFACTURERS)) or \
-                    TARGET_MAC_PREFIX.lower() in mac_address.replace(':', '').replace('-', '.'):
-                filtered_clients.append({
-                    'network': network_name,
-                    'description': client.get('description', 'N/A'),
-                    'mac': client.get('mac'),
-                    'ip': client.get('ip', 'N/A'),
-                    'manufacturer': client.get('manufacturer', 'Unknown'),
-                    'os': client.get('os', 'N/A'),
-                    'vlan': client.get('vlan', 'N/A'),
-                    'status': client.get('status', 'N/A'),
-                    'lastSeen': client.get('lastSeen', 'N/A')
-                })
-
-        if filtered_clients:
-            print(f"\nFound {len(filtered_clients)} matching clients:")
-            for client in filtered_clients:
-                print(f"  - MAC: {client['mac']} | IP: {client['ip']} | "
-                      f"Manufacturer: {client['manufacturer']} | VLAN: {client['vlan']}")
+            if manufacturer_matches[manufacturer] or TARGET_MAC_PREFIX_NORM in mac_address:
+                filtered_clients['network'].append(network_name)
+                for field, default in CLIENT_DEFAULTS.items():
+                    value = client.get(field)
+                    filtered_clients[field].append(default if value is None else value)
+                filtered_clients['stale'].append(stale)
+
+        if filtered_clients['network']:
+            print(f"\nFound {len(filtered_clients['network'])} matching clients:")
+            for mac, ip, manufacturer, vlan in zip(filtered_clients['mac'], filtered_clients['ip'],
+                                                   filtered_clients['manufacturer'], filtered_clients['vlan']):
+                print(f"  - MAC: {mac} | IP: {ip} | Manufacturer: {manufacturer} | VLAN: {vlan}")
         else:
             print(f"No matching clients found in this network.")
 
@@ -152,49 +329,67 @@ def get_filtered_clients(dashboard, network_id, network_name):
     return filtered_clients
 
 
-def get_open_access_ports(dashboard, network_id, network_name):
+async def get_switch_access_ports(dashboard, switch, network_name, switch_stale):
+    """List the access ports on VLAN 10 for a single switch; switch_stale marks switch details from a cached response"""
+    switch_ports = new_columns(PORT_COLUMNS)
+
+    # Get switch ports
+    ports, stale = await cached_call(('getDeviceSwitchPorts', switch['serial']),
+                                     dashboard.switch.getDeviceSwitchPorts, switch['serial'])
+
+    for port in ports:
+        # Check if port is access mode and on VLAN 10
+        # print(port)
+        if port.get('type') == 'access' and port.get('vlan') == TARGET_VLAN:
+            switch_ports['network'].append(network_name)
+            switch_ports['switch_name'].append(switch.get('name', 'Unknown'))
+            switch_ports['switch_serial'].append(switch['serial'])
+            switch_ports['switch_model'].append(switch.get('model', 'Unknown'))
+            switch_ports['port_id'].append(port.get('portId'))
+            switch_ports['name'].append(port.get('name', 'Unnamed'))
+            switch_ports['vlan'].append(port.get('vlan'))
+            switch_ports['type'].append(port.get('type'))
+            switch_ports['enabled'].append(port.get('enabled'))
+            switch_ports['poe_enabled'].append(port.get('poeEnabled', False))
+            switch_ports['link_status'].append(port.get('linkNegotiation', 'N/A'))
+            switch_ports['stale'].append(stale or switch_stale)
+
+    return switch_ports
+
+
+async def get_open_access_ports(dashboard, network_id, network_name, switches, switches_stale, retry_queue):
     """List all open access ports on VLAN 10"""
     print(f"\n{'=' * 80}")
     print(f"Analyzing VLAN 10 Access Ports in Network: {network_name}")
     print(f"{'=' * 80}")
 
-    open_ports = []
+    open_ports = new_columns(PORT_COLUMNS)
 
     try:
-        # Get all switches in the network
-        devices = dashboard.networks.getNetworkDevices(network_id)
-        switches = [d for d in devices if d.get('model', '').startswith('MS')]
-
         for switch in switches:
             try:
-                # Get switch ports
-                ports = dashboard.switch.getDeviceSwitchPorts(switch['serial'])
-
-                for port in ports:
-                    # Check if port is access mode and on VLAN 10
-                    # print(port)
-                    if port.get('type') == 'access' and port.get('vlan') == TARGET_VLAN:
-                        open_ports.append({
-                            'network': network_name,
-                            'switch_name': switch.get('name', 'Unknown'),
-                            'switch_serial': switch['serial'],
-                            'switch_model': switch.get('model', 'Unknown'),
-                            'port_id': port.get('portId'),
-                            'name': port.get('name', 'Unnamed'),
-                            'vlan': port.get('vlan'),
-                            'type': port.get('type'),
-                            'enabled': port.get('enabled'),
-                            'poe_enabled': port.get('poeEnabled', False),
-                            'link_status': port.get('linkNegotiation', 'N/A')
-                        })
+                switch_ports = await get_switch_access_ports(dashboard, switch, network_name, switches_stale)
+                extend_columns(open_ports, switch_ports)
+
+            except meraki.exceptions.AsyncAPIError as e:
+                if not is_transient(e):
+                    print(f"  Error retrieving ports for switch {switch['serial']}: {e}")
+                    continue
+                print(f"  Error retrieving ports for switch {switch['serial']}, queued for retry: {e}")
+
+                async def retry_switch(switch=switch):
+                    switch_ports = await get_switch_access_ports(dashboard, switch, network_name, switches_stale)
+                    extend_columns(open_ports, switch_ports)
+
+                retry_queue.append((f"ports on switch {switch['serial']}", retry_switch))
 
             except Exception as e:
                 print(f"  Error retrieving ports for switch {switch['serial']}: {e}")
                 continue
 
-        if open_ports:
-            print(f"\nFound {len(open_ports)} open access ports on VLAN 10:")
-            for port in open_ports:
+        if open_ports['network']:
+            print(f"\nFound {len(open_ports['network'])} open access ports on VLAN 10:")
+            for port in column_rows(open_ports):
                 print(f"  - Switch: {port['switch_name']} ({port['switch_serial']}) | "
                       f"Port: {port['port_id']} ({port['name']}) | PoE: {port['poe_enabled']}")
         else:
@@ -206,17 +401,15 @@ def get_open_access_ports(dashboard, network_id, network_name):
     return open_ports
 
 
-def get_device_inventory(dashboard, network_id, network_name):
+async def get_device_inventory(dashboard, network_id, network_name, devices, status_by_serial, stale):
     """Get detailed device information including version, MAC, model, serial, and uptime"""
     print(f"\n{'=' * 80}")
     print(f"Device Inventory for Network: {network_name}")
     print(f"{'=' * 80}")
 
-    device_inventory = []
+    device_inventory = new_columns(DEVICE_COLUMNS)
 
     try:
-        devices = dashboard.networks.getNetworkDevices(network_id)
-
         for device in devices:
             device_info = {
                 'network': network_name,
@@ -227,29 +420,17 @@ def get_device_inventory(dashboard, network_id, network_name):
                 'firmware': device.get('firmware', 'Unknown'),
                 'lan_ip': device.get('lanIp', 'N/A'),
                 'tags': device.get('tags', []),
+                'uptime': 'N/A',  # The Dashboard API has no endpoint reporting device uptime
             }
 
-            # Try to get device uplink information for uptime
-            try:
-                uplink_info = dashboard.devices.getDeviceUplink(device['serial'])
-                device_info['uptime'] = uplink_info.get('uptime', 'N/A')
-            except:
-                device_info['uptime'] = 'N/A'
+            # Look up device status from the org-wide status map
+            status = status_by_serial.get(device['serial'], {})
+            device_info['status'] = status.get('status', 'Unknown')
+            device_info['lastReportedAt'] = status.get('lastReportedAt', 'N/A')
+            device_info['stale'] = stale
 
-            # Try to get device status for additional info
-            try:
-                status = dashboard.organizations.getOrganizationDevicesStatuses(
-                    dashboard.organizations.getOrganizations()[0]['id'],
-                    serials=[device['serial']]
-                )
-                if status:
-                    device_info['status'] = status[0].get('status', 'Unknown')
-                    device_info['lastReportedAt'] = status[0].get('lastReportedAt', 'N/A')
-            except:
-                device_info['status'] = 'Unknown'
-                device_info['lastReportedAt'] = 'N/A'
-
-            device_inventory.append(device_info)
+            for column in DEVICE_COLUMNS:
+                device_inventory[column].append(device_info[column])
 
             print(f"\n  Device: {device_info['name']}")
             print(f"    Serial: {device_info['serial']}")
@@ -266,37 +447,172 @@ def get_device_inventory(dashboard, network_id, network_name):
     return device_inventory
 
 
+def excel_value(value):
+    """Convert a value openpyxl cannot store in a cell (e.g. a tag list) to text"""
+    if isinstance(value, (list, dict)):
+        return str(value)
+    return value
+
+
+def write_excel_sheet(workbook, sheet_name, columns):
+    """Write a column-wise result set to a new sheet, one header row then one row per result"""
+    worksheet = workbook.create_sheet(sheet_name)
+    worksheet.append(list(columns))
+    for row in zip(*columns.values()):
+        worksheet.append([excel_value(value) for value in row])
+
+
+def checkpoint_header():
+    """Header record that starts every checkpoint, identifying the organization and when the run began"""
+    return {'org_id': ORG_ID, 'created': time.time()}
+
+
+def read_checkpoint(filename):
+    """
+    Read the header and per-network records saved in a checkpoint file.
+    Returns (header, records, length) where length is the size of the header and the complete records,
+    excluding any record cut short by an interrupted run or corrupted on disk, and anything after it.
+    Returns (None, [], 0) if there is no checkpoint or it does not start with a header.
+    """
+    header = None
+    records = []
+    length = 0
+    try:
+        with open(filename, 'rb') as f:
+            unpacker = msgpack.Unpacker(f)
+            for record in unpacker:
+                if header is None:
+                    if not isinstance(record, dict) or 'org_id' not in record or 'created' not in record:
+                        break
+                    header = record
+                elif isinstance(record, dict) and 'network_id' in record:
+                    records.append(record)
+                else:
+                    break
+                length = unpacker.tell()
+    except FileNotFoundError:
+        pass
+    except (msgpack.exceptions.UnpackException, ValueError) as e:
+        print(f"Checkpoint {filename} is corrupt after {len(records)} networks: {e!r}")
+    return header, records, length
+
+
+def checkpoint_resumable(header):
+    """True if a checkpoint header was written by a run of this organization that is recent enough to resume"""
+    return header is not None and header['org_id'] == ORG_ID and \
+        time.time() - header['created'] < CHECKPOINT_MAX_AGE
+
+
+def arrow_value(value, field_type):
+    """Convert one result value to the schema's type, with placeholders such as 'N/A' becoming null"""
+    if value is None or (isinstance(value, str) and value in PLACEHOLDERS):
+        return None
+    if pa.types.is_integer(field_type):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None  # An unexpected value loses only this cell, not the whole export
+    if pa.types.is_string(field_type):
+        return str(value)
+    return value
+
+
+def arrow_table(columns, schema):
+    """Build an Arrow table straight from a column-wise result set, one column at a time in the given schema"""
+    arrays = [pa.array([arrow_value(value, field.type) for value in columns[field.name]], type=field.type)
+              for field in schema]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def export_results_to_parquet(all_clients, all_ports, all_devices):
+    """Export each result set to its own zstd-compressed Parquet file; returns False if any file fails"""
+    ok = True
+    # Each file is written on its own, so one bad table does not block the other two
+    for columns, schema, filename in ((all_clients, CLIENT_SCHEMA, 'clients.parquet'),
+                                      (all_ports, PORT_SCHEMA, 'ports.parquet'),
+                                      (all_devices, DEVICE_SCHEMA, 'devices.parquet')):
+        try:
+            pq.write_table(arrow_table(columns, schema), filename, compression='zstd')
+            print(f"Results exported to {filename}")
+        except Exception as e:
+            print(f"Error exporting Parquet results to {filename}: {e}")
+            ok = False
+    return ok
+
+
 def export_results_to_json(all_clients, all_ports, all_devices, filename='meraki_audit_results.json'):
-    """Export all results to a JSON file"""
+    """Export all results to a JSON file and an Excel workbook; returns False if either export fails"""
     results = {
-        'timestamp': datetime.now().isoformat(),
-        'filtered_clients': all_clients,
-        'vlan10_access_ports': all_ports,
-        'device_inventory': all_devices
+        'timestamp': datetime.now().astimezone(),  # orjson serializes aware datetimes as ISO 8601
+        # Keep the JSON export row-wise, which is easier to read
+        'filtered_clients': column_rows(all_clients),
+        'vlan10_access_ports': column_rows(all_ports),
+        'device_inventory': column_rows(all_devices)
     }
 
-    # df = pd.DataFrame(results)
-    # pd.json_normalize()
-    # df.to_excel('output.xlsx', index=False)
-
-    with pd.ExcelWriter('output.xlsx', engine='openpyxl') as writer:
-        pd.DataFrame(all_clients).to_excel(writer, sheet_name='Clients', index=False)
-        pd.DataFrame(all_ports).to_excel(writer, sheet_name='Ports', index=False)
-        pd.DataFrame(all_devices).to_excel(writer, sheet_name='Devices', index=False)
+    # A failed Excel export (e.g. output.xlsx open in Excel) still lets the JSON export run
+    excel_ok = True
+    try:
+        # write_only streams rows straight to the file instead of building every cell in memory
+        workbook = openpyxl.Workbook(write_only=True)
+        write_excel_sheet(workbook, 'Clients', all_clients)
+        write_excel_sheet(workbook, 'Ports', all_ports)
+        write_excel_sheet(workbook, 'Devices', all_devices)
+        workbook.save('output.xlsx')
+    except Exception as e:
+        print(f"Error exporting results to output.xlsx: {e}")
+        excel_ok = False
 
     try:
-        with open(filename, 'w') as f:
-            json.dump(results, f, indent=2)
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
         print(f"\n{'=' * 80}")
         print(f"Results exported to {filename}")
         print(f"{'=' * 80}")
+        return excel_ok
     except Exception as e:
         print(f"Error exporting results: {e}")
+        return False
+
+
 
 
+async def process_network(dashboard, network, status_by_serial, statuses_stale, semaphore):
+    """Run all three tasks for a single network, bounded by the shared semaphore"""
+    network_name = network['name']
+    network_id = network['id']
 
+    # Calls that still fail after backing off are retried once the network's first pass is done
+    retry_queue = deque()
 
-def main():
+    async with semaphore:
+        # Task 1: Get filtered clients, while the device list is fetched for tasks 2 and 3
+        clients_task = asyncio.create_task(get_filtered_clients(dashboard, network_id, network_name))
+
+        # Fetch the network's devices once and share them between tasks 2 and 3
+        devices, devices_stale = await get_network_devices(dashboard, network_id, network_name)
+        switches = [d for d in devices if d.get('model', '').startswith('MS')]
+
+        # Task 2: Get VLAN 10 access ports
+        # Task 3: Get device inventory
+        vlan10_ports, device_inventory = await asyncio.gather(
+            get_open_access_ports(dashboard, network_id, network_name, switches, devices_stale, retry_queue),
+            get_device_inventory(dashboard, network_id, network_name, devices, status_by_serial,
+                                 devices_stale or statuses_stale)
+        )
+        filtered_clients = await clients_task
+        await drain_retry_queue(retry_queue)
+
+    return {
+        'network_id': network_id,
+        'network': network_name,
+        'clients': filtered_clients,
+        'ports': vlan10_ports,
+        'devices': device_inventory
+    }
+
+
+async def main():
     """Main execution function"""
     print(f"\n{'#' * 80}")
     print(f"# Meraki Dashboard Automation Script")
@@ -309,57 +625,80 @@ def main():
         print("Set it with: export MERAKI_DASHBOARD_API_KEY='your_api_key_here'")
         return
 
-    dashboard = initialize_dashboard(API_KEY)
+    dashboard = await initialize_dashboard(API_KEY)
     if not dashboard:
         return
 
-    # Get organizations
-    organizations = [ORG_ID]
-    if not organizations:
-        print("No organizations found or error retrieving organizations.")
-        return
+    async with dashboard:
+        # Get organizations
+        organizations = [ORG_ID]
+        if not organizations:
+            print("No organizations found or error retrieving organizations.")
+            return
 
-    # Storage for all results
-    all_filtered_clients = []
-    all_vlan10_ports = []
-    all_device_inventory = []
+        # Process each organization
+        print(f"\n{'#' * 80}")
+        print(f"# Processing Organization: {ORG_ID}")
+        print(f"{'#' * 80}")
 
-    # Process each organization
+        # Get all networks in the organization
+        networks = await get_all_networks(dashboard, ORG_ID)
+        if networks is None:
+            # Exporting now would replace the last good results with empty files, so keep them and the checkpoint
+            print("Could not retrieve networks; previous exports and checkpoint left unchanged.")
+            return
+
+        # Get every device status in one call instead of once per device
+        status_by_serial, statuses_stale = await get_device_statuses(dashboard, ORG_ID)
+
+        # Skip networks already saved by a recent interrupted run of this org, and drop any record it left
+        # half-written. Any other checkpoint would pass off old results as fresh, so it is started over.
+        header, checkpointed, checkpoint_length = read_checkpoint(CHECKPOINT_FILE)
+        resume = checkpoint_resumable(header)
+        done = {record['network_id'] for record in checkpointed} if resume else set()
+        if resume:
+            print(f"Resuming from {CHECKPOINT_FILE}: {len(done)} networks already processed")
+            os.truncate(CHECKPOINT_FILE, checkpoint_length)
+        elif os.path.exists(CHECKPOINT_FILE):
+            print(f"Discarding {CHECKPOINT_FILE}: not from a run of this organization in the last day")
+
+        # Process networks concurrently, at most MAX_CONCURRENT_NETWORKS at a time
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_NETWORKS)
+        tasks = [process_network(dashboard, network, status_by_serial, statuses_stale, semaphore)
+                 for network in networks if network['id'] not in done]
+
+        # Checkpoint each network's results as soon as it finishes, so an interrupted run only loses
+        # the networks that were still being processed
+        with open(CHECKPOINT_FILE, 'ab' if resume else 'wb') as checkpoint_f:
+            if not resume:
+                checkpoint_f.write(msgpack.packb(checkpoint_header()))
+            for finished in asyncio.as_completed(tasks):
+                checkpoint_f.write(msgpack.packb(await finished))
+                checkpoint_f.flush()
+
+    # Merge the checkpointed networks and export results once, after every network has been processed
+    all_filtered_clients = new_columns(CLIENT_COLUMNS)
+    all_vlan10_ports = new_columns(PORT_COLUMNS)
+    all_device_inventory = new_columns(DEVICE_COLUMNS)
+    for record in read_checkpoint(CHECKPOINT_FILE)[1]:
+        extend_columns(all_filtered_clients, record['clients'])
+        extend_columns(all_vlan10_ports, record['ports'])
+        extend_columns(all_device_inventory, record['devices'])
+
+    # Print summary
     print(f"\n{'#' * 80}")
-    print(f"# Processing Organization: {ORG_ID}")
+    print(f"# SUMMARY")
     print(f"{'#' * 80}")
+    print(f"Total Filtered Clients: {len(all_filtered_clients['network'])}")
+    print(f"Total VLAN 10 Access Ports: {len(all_vlan10_ports['network'])}")
+    print(f"Total Devices: {len(all_device_inventory['network'])}")
 
-    # Get all networks in the organization
-    networks = get_all_networks(dashboard, ORG_ID)
-
-    # Process each network
-    for network in networks:
-        network_name = network['name']
-        network_id = network['id']
-
-        # Task 1: Get filtered clients
-        filtered_clients = get_filtered_clients(dashboard, network_id, network_name)
-        all_filtered_clients.extend(filtered_clients)
-
-        # Task 2: Get VLAN 10 access ports
-        vlan10_ports = get_open_access_ports(dashboard, network_id, network_name)
-        all_vlan10_ports.extend(vlan10_ports)
-
-        # Task 3: Get device inventory
-        device_inventory = get_device_inventory(dashboard, network_id, network_name)
-        all_device_inventory.extend(device_inventory)
-
-
-        # Print summary
-        print(f"\n{'#' * 80}")
-        print(f"# SUMMARY")
-        print(f"{'#' * 80}")
-        print(f"Total Filtered Clients: {len(all_filtered_clients)}")
-        print(f"Total VLAN 10 Access Ports: {len(all_vlan10_ports)}")
-        print(f"Total Devices: {len(all_device_inventory)}")
+    parquet_ok = export_results_to_parquet(all_filtered_clients, all_vlan10_ports, all_device_inventory)
+    json_ok = export_results_to_json(all_filtered_clients, all_vlan10_ports, all_device_inventory)
 
-        # Export results
-        export_results_to_json(all_filtered_clients, all_vlan10_ports, all_device_inventory)
+    # Keep the checkpoint if an export failed, so rerunning can export without calling the API again
+    if parquet_ok and json_ok:
+        os.remove(CHECKPOINT_FILE)
 
 
 print(f"\n{'#' * 80}")
@@ -367,4 +706,4 @@ print(f"# Script Execution Complete")
 print(f"{'#' * 80}\n")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
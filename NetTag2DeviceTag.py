@@ -7,19 +7,33 @@ This scipt copies all NETWORK tags and applies them to ALL DEVICES in that NETWO
 
 """
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import meraki
 import os
 from pprint import pprint  # pprint makes printing lists and dictionaries prettier to read
+import cache
 
 # MUST CREATE environment.env FILE WITH THE FOLLOWING VARIABLES #
 load_dotenv('environment.env')
 API_KEY = os.getenv('API_KEY')
 # I am setting Org ID based on my own network documentation
 organization_id = os.getenv('ORG_ID')
+# Network and device tags rarely change, so reuse API responses from the last hour (see cache.py)
+CACHE_TTL = 3600
+# Meraki allows a handful of concurrent sessions per org, so cap parallel API calls at 5
+MAX_WORKERS = 5
+PER_PAGE = 1000  # Largest page size getOrganizationDevices accepts
 
 # INITIALIZE DASHBOARD OBJECT
-dashboard = meraki.DashboardAPI(API_KEY, print_console=False)
+dashboard = meraki.DashboardAPI(
+    API_KEY,
+    print_console=False,
+    single_request_timeout=30,
+    wait_on_rate_limit=True,  # Sleep and retry on 429s instead of failing
+    nginx_429_retry_wait_time=10,
+    maximum_retries=10
+)
 # dashboard = meraki.DashboardAPI(API_KEY, suppress_logging=True) # Change to true to stop log outputs
 
 # Uncomment if you need to get your org or network ID.
@@ -29,30 +43,56 @@ dashboard = meraki.DashboardAPI(API_KEY, print_console=False)
 
 
 # Get a list of all networks : Response object is a list of dictionaries
-networks_list = dashboard.organizations.getOrganizationNetworks(
-    organization_id, total_pages='all'
+networks_list = cache.cached(
+    (organization_id, 'networks'), CACHE_TTL,
+    dashboard.organizations.getOrganizationNetworks, organization_id, total_pages='all', perPage=PER_PAGE
+)
+
+# Tags for every network, keyed by network ID
+network_tags_by_id = {network['id']: frozenset(network['tags']) for network in networks_list}
+
+# Get every device in the org in one paginated call; each device carries its networkId and tags
+devices_list = cache.cached(
+    (organization_id, 'devices'), CACHE_TTL,
+    dashboard.organizations.getOrganizationDevices, organization_id, total_pages='all', perPage=PER_PAGE
 )
+devices_fetched_at = cache.load((organization_id, 'devices'))[0]  # When devices_list was read from the API
 
 ### TASK ###
-# Loop through all networks in networks_list.
-# Copy network tags
-# Get all devices in network
+# Loop through all devices in devices_list.
+# Look up the tags of the device's network
 # Copy existing tags. Combine with network tags. Apply new set of tags.
 ###
 
 
-# Loop through list of networks: Each network is a dictionary object
-for network in networks_list:  # network is a dictionary object with that network's data
-    network_tags = network['tags']  # Extract tags from dictionary
-    # print(network_tags)
-    network_devices = dashboard.networks.getNetworkDevices(network['id'])  # GET All Devices in the network
-    for device in network_devices:  # Loop through each device. Device is a dictionary with that device's data
-        device_serial = device['serial']  # Extract serial and device tags
-        device_tags = device['tags']
-        new_tags = list(set(network_tags + device_tags))  # Combine unique entries in network and device tags
-        # Update device tags to match network tags if different
-        if set(device_tags) != set(new_tags):  # Check if the device tags already match desired tags list
-            print(f"Updating device {device_serial} tags from {device_tags} to {new_tags}")
-            # dashboard.devices.updateDevice(device_serial, tags=new_tags)  # APPLY DEVICE TAGS
-        else:
-            print(f"Device {device_serial} already has matching tags: {device_tags} and {new_tags}")
+def update_device_tags(device_serial, device_tags, new_tags):
+    """Apply the combined tag list to one device (runs on a worker thread)"""
+    print(f"Updating device {device_serial} tags from {device_tags} to {new_tags}")
+    # dashboard.devices.updateDevice(device_serial, tags=new_tags)  # APPLY DEVICE TAGS
+    # cache.store((device_serial, 'tags'), cache.tags_digest(new_tags))  # Uncomment together with the line above
+
+
+jobs = []  # (serial, current tags, new tags) for every device that needs updating
+for device in devices_list:  # Loop through each device. Device is a dictionary with that device's data
+    network_tags = network_tags_by_id.get(device.get('networkId'), frozenset())
+    device_serial = device['serial']  # Extract serial and device tags
+    device_tags = device['tags']
+    device_tag_set = frozenset(device_tags)
+    # Combined tags only differ from the device's own if some network tag is missing from it
+    if not network_tags <= device_tag_set:
+        new_tags = sorted(network_tags | device_tag_set)  # Combine unique entries in network and device tags
+        # Cached device data can predate our last update, so skip devices we pushed these tags to since it was fetched
+        pushed_at, pushed_digest = cache.load((device_serial, 'tags'))
+        if pushed_at > devices_fetched_at and pushed_digest == cache.tags_digest(new_tags):
+            print(f"Device {device_serial} already updated to {new_tags} on a previous run")
+            continue
+        jobs.append((device_serial, device_tags, new_tags))
+    else:
+        print(f"Device {device_serial} already has all network tags: {device_tags}")
+
+# Every update is network-bound, so push up to MAX_WORKERS of them at once
+with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+    # result() re-raises any error from a worker
+    futures = [executor.submit(update_device_tags, *job) for job in jobs]
+    for future in as_completed(futures):
+        future.result()
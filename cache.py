@@ -0,0 +1,90 @@
+"""
+Disk-backed JSON cache for Meraki API responses
+
+Each entry is stored in .meraki_cache/ as {"ts": <time stored>, "value": <API response>},
+under a file name derived from the entry's key. Network and device tags change rarely,
+so reruns can serve them from here instead of calling the Dashboard API again.
+When the API is unreachable, the last stored response can be served instead of failing.
+
+"""
+
+import hashlib
+import json
+import os
+import time
+
+CACHE_DIR = '.meraki_cache'
+
+
+def _cache_path(key):
+    """Map a cache key (any JSON-serializable value) to its file in CACHE_DIR"""
+    digest = hashlib.sha1(json.dumps(key).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{digest}.json")
+
+
+def load(key):
+    """Return (timestamp, value) for key, or (0, None) if nothing has been stored"""
+    try:
+        with open(_cache_path(key)) as f:
+            entry = json.load(f)
+        return entry['ts'], entry['value']
+    except (OSError, ValueError, KeyError):
+        return 0, None
+
+
+def store(key, value):
+    """Save value under key with the current time"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'ts': time.time(), 'value': value}, f)
+    os.replace(tmp_path, path)  # Atomic, so a crashed run never leaves a half-written entry
+
+
+def cached(key, ttl, fn, *args, **kwargs):
+    """
+    Return the cached value for key if it is younger than ttl seconds, otherwise call fn and cache the result.
+    If the call fails and an older value is on disk, that stale value is returned instead of raising.
+    """
+    ts, value = load(key)
+    if time.time() - ts < ttl:
+        return value
+
+    try:
+        value = fn(*args, **kwargs)
+    except Exception as e:
+        if value is None:
+            raise
+        print(f"Using cached data for {key} from {time.ctime(ts)} after API error: {e}")
+        return value
+
+    store(key, value)
+    return value
+
+
+async def cached_async(key, ttl, fallback_ttl, fn, *args, **kwargs):
+    """
+    Coroutine version of cached() that also reports whether the value is stale.
+    Returns (value, stale). A failed call falls back to a cached value younger than fallback_ttl seconds.
+    """
+    ts, value = load(key)
+    age = time.time() - ts
+    if age < ttl:
+        return value, False
+
+    try:
+        value = await fn(*args, **kwargs)
+    except Exception as e:
+        if value is None or age >= fallback_ttl:
+            raise
+        print(f"Using cached data for {key} from {time.ctime(ts)} after API error: {e}")
+        return value, True
+
+    store(key, value)
+    return value, False
+
+
+def tags_digest(tags):
+    """Order-independent fingerprint of a tag list"""
+    return hashlib.sha1(json.dumps(sorted(tags)).encode()).hexdigest()